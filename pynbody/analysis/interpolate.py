@@ -29,12 +29,12 @@ def interpolate3d(x, y, z, x_vals, y_vals, z_vals, vals):
     vals : grid values
     """
 
-    # cast x_vals, y_vals and z_vals to float64
+    # cast x_vals, y_vals and z_vals to float64; this does not copy when they are already contiguous float64
 
-    x_vals = x_vals.astype(np.float64)
-    y_vals = y_vals.astype(np.float64)
-    z_vals = z_vals.astype(np.float64)
-    vals = vals.astype(np.float64)
+    x_vals = np.ascontiguousarray(x_vals, dtype=np.float64)
+    y_vals = np.ascontiguousarray(y_vals, dtype=np.float64)
+    z_vals = np.ascontiguousarray(z_vals, dtype=np.float64)
+    vals = np.ascontiguousarray(vals, dtype=np.float64)
 
     result_array = np.empty(len(x), dtype=np.float64)
 
@@ -64,12 +64,12 @@ def interpolate2d(x, y, x_vals, y_vals, vals):
     vals : grid values
     """
 
-    x_vals = x_vals.astype(np.float64)
-    y_vals = y_vals.astype(np.float64)
-    z_vals = np.ndarray(1, dtype=np.float64)
+    x_vals = np.ascontiguousarray(x_vals, dtype=np.float64)
+    y_vals = np.ascontiguousarray(y_vals, dtype=np.float64)
 
-    vals = vals.astype(np.float64)
-    vals.resize((1,) + vals.shape)
+    # view the table as 3D without copying it, if it is already contiguous float64
+    vals = np.ascontiguousarray(vals, dtype=np.float64)
+    vals = vals.reshape((1,) + vals.shape)
 
     result_array = np.empty(len(x), dtype=np.float64)
 
@@ -28,20 +28,64 @@ Information about available tables is provided in the function :func:`use_custom
 """
 
 import abc
+import collections.abc
+import functools
 import logging
 import os
 import subprocess
+from typing import NamedTuple
 
 import h5py
 import numpy as np
-from scipy.interpolate import RegularGridInterpolator
 
 from .. import util
 
 logger = logging.getLogger('pynbody.analysis.ionfrac')
 
-from .interpolate import interpolate3d
-
+from .interpolate import interpolate2d
+
+
+_ELEMENT_SYMBOLS = {
+    "Hydrogen": "H",
+    "Helium": "He",
+    "Lithium": "Li",
+    "Beryllium": "Be",
+    "Boron": "B",
+    "Carbon": "C",
+    "Nitrogen": "N",
+    "Oxygen": "O",
+    "Fluorine": "F",
+    "Neon": "Ne",
+    "Sodium": "Na",
+    "Magnesium": "Mg",
+    "Aluminium": "Al",
+    "Silicon": "Si",
+    "Phosphorus": "P",
+    "Sulphur": "S",
+    "Chlorine": "Cl",
+    "Argon": "Ar",
+    "Potassium": "K",
+    "Calcium": "Ca",
+    "Scandium": "Sc",
+    "Titanium": "Ti",
+    "Vanadium": "V",
+    "Chromium": "Cr",
+    "Manganese": "Mn",
+    "Iron": "Fe",
+    "Cobalt": "Co",
+    "Nickel": "Ni",
+    "Copper": "Cu",
+    "Zinc": "Zn"
+}
+
+_ION_STAGES = ("I", "II", "III", "IV", "V", "VI", "VII", "VIII", "IX", "X", "XI", "XII",
+               "XIII", "XIV", "XV", "XVI", "XVII")
+
+# Hydrogen has a special case of outputting molecular hydrogen in place of the third stage
+_ION_STAGES_H = ("I", "II", "2") + _ION_STAGES[3:]
+
+# cloudy writes the log10 ionisation fraction of each stage in a fixed-width column of 7 characters
+_ION_FIELD_SLICES = tuple(slice(11 + i * 7, 18 + i * 7) for i in range(len(_ION_STAGES)))
 
 def _cloudy_output_line_to_dictionary(line):
     """Process a single line from the cloudy ionisation output.
@@ -50,110 +94,58 @@ def _cloudy_output_line_to_dictionary(line):
 
     The ionisation fractions for a given element sum to one.
     """
-    element_symbols = {
-        "Hydrogen": "H",
-        "Helium": "He",
-        "Lithium": "Li",
-        "Beryllium": "Be",
-        "Boron": "B",
-        "Carbon": "C",
-        "Nitrogen": "N",
-        "Oxygen": "O",
-        "Fluorine": "F",
-        "Neon": "Ne",
-        "Sodium": "Na",
-        "Magnesium": "Mg",
-        "Aluminium": "Al",
-        "Silicon": "Si",
-        "Phosphorus": "P",
-        "Sulphur": "S",
-        "Chlorine": "Cl",
-        "Argon": "Ar",
-        "Potassium": "K",
-        "Calcium": "Ca",
-        "Scandium": "Sc",
-        "Titanium": "Ti",
-        "Vanadium": "V",
-        "Chromium": "Cr",
-        "Manganese": "Mn",
-        "Iron": "Fe",
-        "Cobalt": "Co",
-        "Nickel": "Ni",
-        "Copper": "Cu",
-        "Zinc": "Zn"
-    }
-
-    ion_stages = ["I", "II", "III", "IV", "V", "VI", "VII", "VIII", "IX", "X", "XI", "XII",
-                  "XIII", "XIV", "XV", "XVI", "XVII"]
-
-    element_name = line[1:11].strip()
+    element_symbol = _ELEMENT_SYMBOLS.get(line[1:11].strip())
+    if element_symbol is None:
+        return {}
+
     ion_fracs = []
-    for i in range(17):
-        this_ion = line[11 + i * 7:18 + i * 7].strip()
+    for field in _ION_FIELD_SLICES:
+        this_ion = line[field].strip()
+        if not this_ion:
+            break
         try:
-            ion_fracs.append(10.**float(this_ion))
+            ion_fracs.append(10. ** float(this_ion))
         except ValueError:
             break
 
-    if element_name not in element_symbols:
-        return {}
-
-    element_symbol = element_symbols[element_name]
+    ion_stages = _ION_STAGES_H if element_symbol == "H" else _ION_STAGES
 
-    if element_symbol == "H":
-        # Hydrogen has a special case of outputting molecular hydrogen
-        ion_stages[2] = "2"
+    total = sum(ion_fracs) # normalise to correct any rounding errors
 
-    ion_fracs = np.asarray(ion_fracs)
-    ion_fracs /= ion_fracs.sum() # correct any rounding errors
+    return {element_symbol + ion_stage: ion_frac / total for ion_stage, ion_frac in zip(ion_stages, ion_fracs)}
 
-    return {element_symbol + ion_stage: float(ion_frac) for ion_stage, ion_frac in zip(ion_stages, ion_fracs)}
+# Input for cloudy, which is fussy about indentation. Numbers are passed as python floats and formatted with %a,
+# i.e. as their shortest exact repr
+_CLOUDY_INPUT_TEMPLATE = b"""title pynbody_grid_run
+cmb z=%(redshift)a
+table %(table)s z = %(redshift)a
+hden %(log_hden)a
+metals %(metallicity)a
+constant temperature %(temperature)a
+stop zone 1
+"""
 
 def _run_cloudy(redshift, log_temp, log_den, table, cloudy_path, metallicity=0.1):
     """
     Run cloudy and return the output ionisation fractions
     """
-    template = """title pynbody_grid_run
-    cmb z={redshift}
-    table {table} z = {redshift}
-    hden {log_hden}
-    metals {metallicity}
-    constant temperature {temperature}
-    stop zone 1
-    """
-
     # correct from total density to hydrogen density on the assumption of 1/10th solar metallicity
     Y_over_X = 0.245/0.755 # primordial helium over hydrogen mass fraction
     Z_over_X = metallicity * 0.0187 # metals mass fraction, https://www.aanda.org/articles/aa/pdf/2024/01/aa46928-23.pdf
     X =1./(1+Y_over_X+Z_over_X)
 
-    input = template.format(redshift=redshift, log_hden=log_den + np.log10(X), temperature=10**log_temp, table=table,
-                            metallicity=metallicity)
-
-    # cloudy is fussy about its input -- remove any indentation and replace newlines with '\n'
-    input = '\n'.join([x.strip() for x in input.split('\n')])
-
-
-
-    # Start the subprocess
-    process = subprocess.Popen(
-        [cloudy_path],  # Replace with your command and arguments
-        stdin=subprocess.PIPE,  # Allows writing to stdin
-        stdout=subprocess.PIPE,  # Allows reading from stdout
-        stderr=subprocess.PIPE,  # Capture stderr (optional)
-        text=True  # Ensures that communication is in string format (instead of bytes)
-    )
+    input = _CLOUDY_INPUT_TEMPLATE % {b'redshift': float(redshift), b'log_hden': float(log_den + np.log10(X)),
+                                      b'temperature': float(10**log_temp), b'table': table.encode(),
+                                      b'metallicity': float(metallicity)}
 
-    process.stdin.write(input)
-    process.stdin.flush()  # Flush the input to ensure it is sent
-
-    stdout, stderr = process.communicate()  # Waits for the process to complete and fetches output
+    # Run cloudy, communicating in bytes; only the lines of the ionisation table are decoded below
+    process = subprocess.run([cloudy_path], input=input, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
 
     # search for "Log10 Mean Ionisation" in the output
     table_start_line_number = None
-    out_lines = stdout.split('\n')
+    out_lines = process.stdout.split(b'\n')
     for i, line in enumerate(out_lines):
-        if "Log10 Mean Ionisation (over radius)" in line:
+        if b"Log10 Mean Ionisation (over radius)" in line:
             table_start_line_number = i
             break
 
@@ -164,15 +156,42 @@ def _run_cloudy(redshift, log_temp, log_den, table, cloudy_path, metallicity=0.1
 
     for i in range(0, 29):
         result.update(_cloudy_output_line_to_dictionary(
-            out_lines[table_start_line_number + i]
+            out_lines[table_start_line_number + i].decode()
         ))
 
     return result
 
-def _run_cloudy_task_wrapper(args):
-    """Wrapper for _run_cloudy that can be called by multiprocessing.Pool"""
-    return _run_cloudy(*args)
+def _run_cloudy_task_wrapper(task, cloudy_path):
+    """Wrapper for _run_cloudy that can be called by multiprocessing.Pool
+
+    The task is a tuple of (grid_index, cloudy_args); the grid index is passed back alongside the result so that
+    results can be processed in whatever order they complete."""
+    grid_index, args = task
+    return grid_index, _run_cloudy(*args, cloudy_path=cloudy_path)
+
+def _log10_in_units(array, units):
+    """Return log10 of a simulation array converted to the specified units, as a plain numpy array
+
+    The unit conversion always produces a fresh array, so the logarithm is taken in place on that copy rather than
+    allocating another array."""
+    result = np.asarray(array.in_units(units))
+    np.log10(result, out=result)
+    return result
+
+def _interpolate_table_slice(table, axis_values, value, axis=0):
+    """Linearly interpolate a table along one axis at a single value, returning a table with one fewer dimension.
 
+    The value must lie within the range of axis_values."""
+    index = min(max(np.searchsorted(axis_values, value) - 1, 0), len(axis_values) - 2)
+    weight = (value - axis_values[index]) / (axis_values[index + 1] - axis_values[index])
+    return (1.0 - weight) * np.take(table, index, axis=axis) + weight * np.take(table, index + 1, axis=axis)
+
+
+class PreparedInputs(NamedTuple):
+    """Simulation quantities needed to calculate ion fractions, as returned by :meth:`IonFractionTable.prepare`"""
+    redshift: float
+    log_temp: np.ndarray
+    log_den: np.ndarray
 
 class IonFractionTableBase(abc.ABC):
     """Abstract base class for ionization fraction tables"""
@@ -202,9 +221,46 @@ class IonFractionTableBase(abc.ABC):
         """
         pass
 
+    def prepare(self, simulation):
+        """Precompute whatever :meth:`calculate` needs from a simulation that does not depend on the ion.
+
+        The returned object can be passed to :meth:`calculate` on the same table in place of the simulation, which
+        avoids repeating work when calculating the fractions of many ions, e.g.
+
+        >>> prepared = table.prepare(sim)
+        >>> fractions = {ion: table.calculate(prepared, ion) for ion in ['HI', 'CIV', 'OVI']}
+
+        Tables that have nothing to precompute return the simulation unchanged.
+        """
+        return simulation
+
     def _clamp_values(self, array, vmin, vmax):
         """Modify the array in place to clamp values to the range [vmin, vmax]"""
-        np.clip(array, vmin, vmax, out=array)
+        np.maximum(array, vmin, out=array)
+        np.minimum(array, vmax, out=array)
+
+class _HDF5IonTables(collections.abc.Mapping):
+    """Read-only mapping from ion names to the tables stored in an HDF5 file written by :meth:`IonFractionTable.save`
+
+    The file is opened afresh each time a table is requested, so that only the ions actually used are read and no
+    file handle is held between requests."""
+
+    def __init__(self, filename):
+        self._filename = filename
+        with h5py.File(filename, 'r') as f:
+            self._ions = list(f['ion_tables'].keys())
+
+    def __getitem__(self, ion):
+        if ion not in self._ions:
+            raise KeyError(ion)
+        with h5py.File(self._filename, 'r') as f:
+            return f['ion_tables'][ion][()]
+
+    def __iter__(self):
+        return iter(self._ions)
+
+    def __len__(self):
+        return len(self._ions)
 
 class IonFractionTable(IonFractionTableBase):
     """Class for calculating ion fractions from a grid of *cloudy* models.
@@ -237,11 +293,18 @@ class IonFractionTable(IonFractionTableBase):
         self._redshift_values = redshift_values
         self._log_temp_values = log_temp_values
         self._log_den_values = log_den_values
-        self._tables = {k.upper(): v for k, v in tables.items()}
-        self._interpolators = {ion: RegularGridInterpolator(
-            (self._redshift_values, self._log_temp_values, self._log_den_values),
-            np.log10(np.maximum(self._tables[ion], np.nextafter(0.0, 1.0)))
-        ) for ion in self._tables.keys()}
+        if isinstance(tables, _HDF5IonTables):
+            # ions were stored in upper case by save, and are read from the file only when needed
+            self._tables = tables
+        else:
+            self._tables = {k.upper(): v for k, v in tables.items()}
+
+        # log tables for all ions are held in a single contiguous array, indexed via self._ion_index. Each ion's
+        # slot is only filled in when that ion is first requested; see _get_log_table
+        self._ion_index = {ion: i for i, ion in enumerate(self._tables)}
+        self._log_table = np.empty((len(self._tables), len(redshift_values), len(log_temp_values),
+                                    len(log_den_values)))
+        self._log_table_ready = np.zeros(len(self._tables), dtype=bool)
 
     def calculate(self, simulation, ion='ovi'):
         """Calculate the ionisation fraction for the gas particles of a given simulation
@@ -252,9 +315,9 @@ class IonFractionTable(IonFractionTableBase):
         Parameters
         ----------
 
-        simulation : pynbody.snapshot.SimSnap
+        simulation : pynbody.snapshot.SimSnap | PreparedInputs
             The simulation snapshot to calculate the ion fractions for. The gas particles must have 'rho' and 'temp'
-            fields.
+            fields. Alternatively, the result of calling :meth:`prepare` on a simulation may be passed.
 
         ion : str
             The name of the ion to calculate the fraction for, e.g. HI, MgII, OVI etc. The only molecular fraction
@@ -266,17 +329,66 @@ class IonFractionTable(IonFractionTableBase):
             The ion fraction for each gas particle in the simulation, according to the table.
 
         """
-        den_values = np.log10(simulation.gas['rho'].in_units('m_p cm^-3')).view(np.ndarray)
-        temp_values = np.log10(simulation.gas['temp'].in_units('K')).view(np.ndarray)
-        redshift_values = np.repeat(simulation.properties['z'], len(simulation.gas))
+        if not isinstance(simulation, PreparedInputs):
+            simulation = self.prepare(simulation)
+
+        # All particles share the same redshift, so the redshift axis is collapsed once per call, leaving only a
+        # bilinear interpolation in (temperature, density) to be performed per particle
+        slab = self._redshift_slab(self._get_log_table(ion), simulation.redshift)
+        result = interpolate2d(simulation.log_temp, simulation.log_den, self._log_temp_values, self._log_den_values,
+                               slab)
+        return np.power(10., result, out=result)
+
+    def prepare(self, simulation):
+        """Calculate the log temperature and density of the gas, clamped to the range of this table.
+
+        See :meth:`IonFractionTableBase.prepare` for how to use the result."""
+        den_values = _log10_in_units(simulation.gas['rho'], 'm_p cm^-3')
+        temp_values = _log10_in_units(simulation.gas['temp'], 'K')
         self._clamp_values(temp_values, np.min(self._log_temp_values), np.max(self._log_temp_values))
         self._clamp_values(den_values, np.min(self._log_den_values), np.max(self._log_den_values))
-        return 10 ** self._interpolators[ion.upper()]((redshift_values, temp_values, den_values))
+        return PreparedInputs(simulation.properties['z'], temp_values, den_values)
+
+    def _get_log_table(self, ion):
+        """Return the 3D log10 table for the given ion, calculating it on first use"""
+        ion = ion.upper()
+        index = self._ion_index[ion]
+        log_table = self._log_table[index]
+        if not self._log_table_ready[index]:
+            np.log10(np.maximum(self._tables[ion], np.nextafter(0.0, 1.0)), out=log_table)
+            self._log_table_ready[index] = True
+        return log_table
+
+    def _redshift_slab(self, log_table, redshift):
+        """Linearly interpolate a 3D log table along its redshift axis, returning a 2D (temperature, density) slab"""
+        redshift_values = self._redshift_values
+        if not (redshift_values[0] <= redshift <= redshift_values[-1]):
+            raise ValueError("Redshift %s is outside the range of the ion fraction table (%s to %s)"
+                             % (redshift, redshift_values[0], redshift_values[-1]))
+        return _interpolate_table_slice(log_table, redshift_values, redshift)
 
     def save(self, filename):
-        """Save the table to a numpy .npz file"""
-        np.savez(filename, redshift_values=self._redshift_values, log_temp_values=self._log_temp_values,
-                 log_den_values=self._log_den_values, **self._tables)
+        """Save the table to a file
+
+        If the filename ends in .hdf5 or .h5, the table is saved as an HDF5 file with a separate compressed dataset
+        for each ion, which :meth:`load` can then read one ion at a time. Otherwise, it is saved as a numpy .npz file
+        (the format of the pynbody-provided tables), with .npz appended to the filename if not already present."""
+
+        # read everything in first, in case the table was loaded from the file about to be overwritten
+        tables = dict(self._tables)
+
+        if not str(filename).endswith(('.hdf5', '.h5')):
+            np.savez(filename, redshift_values=self._redshift_values, log_temp_values=self._log_temp_values,
+                     log_den_values=self._log_den_values, **tables)
+            return
+
+        with h5py.File(filename, 'w') as f:
+            f.create_dataset('redshift_values', data=self._redshift_values)
+            f.create_dataset('log_temp_values', data=self._log_temp_values)
+            f.create_dataset('log_den_values', data=self._log_den_values)
+            ion_tables = f.create_group('ion_tables')
+            for ion, table in tables.items():
+                ion_tables.create_dataset(ion, data=table, chunks=True, compression='lzf')
 
     def plot(self, ion='ovi', redshift=0.0):
         """Use matplotlib to plot the ion fraction table for a given ion at a given redshift"""
@@ -291,9 +403,10 @@ class IonFractionTable(IonFractionTableBase):
 
     @classmethod
     def load(cls, filename):
-        """Load a table from a numpy .npz file, generated using :meth:`save`
+        """Load a table from an HDF5 or numpy .npz file, generated using :meth:`save`
 
-        If the file is not found, it is assumed to be a pynbody-provided table. If such a built-in table exists,
+        Ions in an HDF5 file are only read when first used, so the file must remain in place while the table is in
+        use. If the file is not found, it is assumed to be a pynbody-provided table. If such a built-in table exists,
         the path is modified automatically to point at it. If it does not exist, an attempt is made to download it
         from a zenodo repository."""
 
@@ -303,6 +416,11 @@ class IonFractionTable(IonFractionTableBase):
                 # this will raise an exception if the download fails, so now we can try again:
             filename = cls._table_to_path(filename)
 
+        if h5py.is_hdf5(filename):
+            with h5py.File(filename, 'r') as f:
+                axes = f['redshift_values'][()], f['log_temp_values'][()], f['log_den_values'][()]
+            return cls(*axes, _HDF5IonTables(filename))
+
         tables = np.load(filename)
         return cls(tables['redshift_values'], tables['log_temp_values'], tables['log_den_values'],
                    {k: tables[k] for k in tables.files
@@ -333,8 +451,8 @@ class IonFractionTable(IonFractionTableBase):
         """Generate a table by running *cloudy* with the specified ionising radiation table and parameters.
 
         This can take a long time, but the resulting table can then be saved using the :meth:`save` method and reused
-        by calling :meth:`load`. The grid is computed in parallel using the default number of processors detected
-        by ``multiprocessing.Pool``. A progress bar is displayed using ``tqdm``.
+        by calling :meth:`load`. The grid is computed in parallel using one process per processor detected
+        by ``os.cpu_count``. A progress bar is displayed using ``tqdm``.
 
         Parameters
         ----------
@@ -364,7 +482,6 @@ class IonFractionTable(IonFractionTableBase):
 
         """
 
-        tables = {}
         # space redshifts z equally in log(1+z):
         redshift_values = np.exp(
             np.linspace(np.log(1 + redshift_range[0]), np.log(1 + redshift_range[1]), num_redshifts)) - 1.0
@@ -375,20 +492,29 @@ class IonFractionTable(IonFractionTableBase):
 
         from tqdm import tqdm
 
-        with Pool() as pool:
-            tasks = [(redshift, log_temp, log_den, table, cloudy_path)
-                     for redshift in redshift_values for log_temp in log_temp_values for log_den in log_den_values]
-            results = list(tqdm(pool.imap(_run_cloudy_task_wrapper, tasks), total=len(tasks)))
-
-        for task_index, (redshift, log_temp, log_den, _, _) in enumerate(tasks):
-            result = results[task_index]
-            for ion in result.keys():
-                if ion not in tables:
-                    tables[ion] = np.zeros((len(redshift_values), len(log_temp_values), len(log_den_values)))
-                redshift_index = np.searchsorted(redshift_values, redshift, side='left')
-                temp_index = np.searchsorted(log_temp_values, log_temp, side='left')
-                den_index = np.searchsorted(log_den_values, log_den, side='left')
-                tables[ion][redshift_index, temp_index, den_index] = result[ion]
+        # each task is tagged with the grid index its result belongs in
+        tasks = [((redshift_index, temp_index, den_index), (redshift, log_temp, log_den, table))
+                 for redshift_index, redshift in enumerate(redshift_values)
+                 for temp_index, log_temp in enumerate(log_temp_values)
+                 for den_index, log_den in enumerate(log_den_values)]
+
+        shape = (len(redshift_values), len(log_temp_values), len(log_den_values))
+        tables = {}
+
+        processes = os.cpu_count() or 1
+        # send tasks in batches to cut down on inter-process communication, while still leaving enough batches
+        # for the load to balance across processes
+        chunksize = max(1, len(tasks) // (processes * 4))
+
+        run_task = functools.partial(_run_cloudy_task_wrapper, cloudy_path=cloudy_path)
+
+        with Pool(processes) as pool:
+            for grid_index, result in tqdm(pool.imap_unordered(run_task, tasks, chunksize=chunksize),
+                                           total=len(tasks)):
+                for ion, ion_frac in result.items():
+                    if ion not in tables:
+                        tables[ion] = np.zeros(shape)
+                    tables[ion][grid_index] = ion_frac
 
         return cls(redshift_values, log_temp_values, log_den_values, tables)
 
@@ -414,13 +540,10 @@ class V1IonFractionTable(IonFractionTableBase):
         return self._calculate_with_table(simulation, x_vals, y_vals, z_vals, vals)
 
     def _get_sim_values(self, simulation, variable):
-        if variable=='z':
-            result = np.zeros(len(simulation.gas))
-            result[:] = simulation.properties['z']
-        elif variable=='temp':
+        if variable=='temp':
             result = np.log10(simulation.gas['temp']).view(np.ndarray)
         elif variable=='rho':
-            result = np.log10(simulation.gas['rho'].in_units('m_p cm^-3')).view(np.ndarray)
+            result = _log10_in_units(simulation.gas['rho'], 'm_p cm^-3')
         else:
             raise ValueError("Unknown variable: " + variable)
 
@@ -428,18 +551,26 @@ class V1IonFractionTable(IonFractionTableBase):
 
     def _calculate_with_table(self, simulation, x_vals, y_vals, z_vals, vals,
                               x_is='z', y_is='temp', z_is='rho'):
-        x = self._get_sim_values(simulation, x_is)
-        y = self._get_sim_values(simulation, y_is)
-        z = self._get_sim_values(simulation, z_is)
+        axes = [(x_is, x_vals), (y_is, y_vals), (z_is, z_vals)]
+
+        # the redshift is the same for every particle, so collapse that axis of the table once up-front
+        redshift_axis = [name for name, _ in axes].index('z')
+        _, redshift_vals = axes.pop(redshift_axis)
+        redshift = min(max(simulation.properties['z'], np.min(redshift_vals)), np.max(redshift_vals))
+        vals = _interpolate_table_slice(np.asarray(vals, dtype=np.float64), np.asarray(redshift_vals, dtype=np.float64),
+                                        redshift, axis=redshift_axis)
+
+        (a_is, a_vals), (b_is, b_vals) = axes
+        a = self._get_sim_values(simulation, a_is)
+        b = self._get_sim_values(simulation, b_is)
 
-        self._clamp_values(x, np.min(x_vals), np.max(x_vals))
-        self._clamp_values(y, np.min(y_vals), np.max(y_vals))
-        self._clamp_values(z, np.min(z_vals), np.max(z_vals))
+        self._clamp_values(a, np.min(a_vals), np.max(a_vals))
+        self._clamp_values(b, np.min(b_vals), np.max(b_vals))
 
         # interpolate
-        result_array = interpolate3d(x, y, z, x_vals, y_vals, z_vals, vals)
+        result_array = interpolate2d(a, b, a_vals, b_vals, vals)
 
-        return 10 ** result_array
+        return np.power(10., result_array, out=result_array)
 
 class V1DuffyIonFractionTable(V1IonFractionTable):
     """Calculates HI ion fractions using Alan Duffy's archived pynbody v1 table with self-shielding.
@@ -453,7 +584,12 @@ class V1DuffyIonFractionTable(V1IonFractionTable):
         filename = os.path.join(os.path.dirname(__file__), "h1.hdf5")
         if os.path.exists(filename):
             logger.info("Loading %s" % filename)
-            self._table = h5py.File(filename, 'r')
+            # the table is small, so read it all (and take the log of the ionisation balance) once up-front
+            with h5py.File(filename, 'r') as table:
+                self._log_den_values = np.asarray(table['logd'])
+                self._log_temp_values = np.asarray(table['logt'])
+                self._redshift_values = np.asarray(table['redshift'])
+                self._log_ionbal = np.log10(table['ionbal'])
         else:
             raise FileNotFoundError("h1.hdf5 (HI Fraction table) not found")
 
@@ -463,18 +599,18 @@ class V1DuffyIonFractionTable(V1IonFractionTable):
         if ion.lower()!='hi':
             raise ValueError("This table only contains HI fractions")
 
-        hi = self._calculate_with_table(simulation, np.asarray(self._table['logd']), np.asarray(self._table['logt']),
-                                        np.asarray(self._table['redshift']), np.log10(self._table['ionbal']),
-                                        'rho', 'temp', 'z')
+        hi = self._calculate_with_table(simulation, self._log_den_values, self._log_temp_values,
+                                        self._redshift_values, self._log_ionbal, 'rho', 'temp', 'z')
 
         if self._selfshield:
             # NB this is currently untested and only retained for (probable) backward compatibility
             # However, it looks like it sets HI fraction to zero in high density, low T regions; is that right?
 
             ## Selfshield criteria from Duffy et al 2012a for EoS gas
-            hi[simulation.gas['OnEquationOfState'] == 1.] = 0.
-            hi[(simulation.gas['p'].in_units('K k cm**-3') > 150.)
-               & (simulation.gas['temp'].in_units('K') < 10.**(4.5))] = 0.
+            shielded = np.asarray(simulation.gas['OnEquationOfState'] == 1.)
+            shielded |= np.asarray((simulation.gas['p'].in_units('K k cm**-3') > 150.)
+                                   & (simulation.gas['temp'].in_units('K') < 10.**(4.5)))
+            hi[shielded] = 0.
 
         return hi
 
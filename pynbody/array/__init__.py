@@ -180,8 +180,9 @@ class SimArray(np.ndarray):
         """True if this array has been derived by pynbody; False otherwise.
 
         For more information on derived arrays, see :ref:`derived_arrays`."""
-        if self.sim and self.name:
-            return self.sim.is_derived_array(self.name, getattr(self, 'family', None))
+        sim = self.sim # for family arrays, this constructs a new family subsnap each time, so only do it once
+        if sim and self.name:
+            return sim.is_derived_array(self.name, getattr(self, 'family', None))
         else:
             return False
 
@@ -16,6 +16,7 @@ import functools
 from . import config_parser
 
 _registry = []
+_registry_names = set() # names (excluding aliases) of the families in _registry, for fast membership tests
 
 
 def family_names(with_aliases=False):
@@ -115,6 +116,7 @@ class Family:
         self.name = name
         self.aliases = aliases
         _registry.append(self)
+        _registry_names.add(name)
 
     def __repr__(self):
         return "<Family " + self.name + ">"
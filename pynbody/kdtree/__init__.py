@@ -180,7 +180,8 @@ class KDTree:
         indices : array_like
             Indices of the particles within the sphere.
         """
-        smx = kdmain.nn_start(self.kdtree, 1, self.boxsize)
+        # a single ball gather does not repay the cost of copying the positions into tree order
+        smx = kdmain.nn_start(self.kdtree, 1, self.boxsize, False)
 
         particle_ids = kdmain.particles_in_sphere(self.kdtree, smx, center[0], center[1], center[2], radius)
 
@@ -436,6 +437,10 @@ class KDTree:
         where d_i is the calculated dispersion, m is the mass array, rho is the density array, q is the input array,
         s_i is the smoothing length, and W is the kernel function.
 
+        For an Nx3 input, the squared differences are summed over all three components within a single tree
+        traversal, so that the result is the total dispersion (equivalent to the quadrature sum of the dispersions
+        of each component, but three times cheaper to compute).
+
         Actual computation is done in the C++-extension functions smooth.cpp::smDispQty[1,N]D.
 
         Parameters
@@ -449,9 +454,9 @@ class KDTree:
         Returns
         -------
         output : pynbody.array.SimArray
-            The dispersion of the input array.
+            The dispersion of the input array. This is always a 1D array, even if the input is Nx3.
         """
-        output = np.empty_like(array)
+        output = np.empty(len(array), dtype=array.dtype)
         if hasattr(array, "units"):
             output = output.view(ar.SimArray)
             output.units = array.units
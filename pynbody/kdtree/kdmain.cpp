@@ -337,8 +337,9 @@ template<typename T> struct typed_nn_start {
 
     int nSmooth;
     double period;
+    int copyPositions = 1; // whether to make the tree-ordered copy of the positions; see SmoothingContext
 
-    PyArg_ParseTuple(args, "Oi|d", &kdobj, &nSmooth, &period);
+    PyArg_ParseTuple(args, "Oi|dp", &kdobj, &nSmooth, &period, &copyPositions);
     kd = static_cast<KDContext*>(PyCapsule_GetPointer(kdobj, NULL));
 
     if (period <= 0)
@@ -357,7 +358,7 @@ template<typename T> struct typed_nn_start {
 
     smCheckPeriodicityAndWarn(kd, fPeriod);
 
-    smx = smInit<T>(kd, nSmooth, period);
+    smx = smInit<T>(kd, nSmooth, period, copyPositions);
     if (smx == nullptr) return nullptr; // smInit sets the error message
     smSmoothInitStep(smx);
     return PyCapsule_New(smx, NULL, NULL);
@@ -662,6 +663,28 @@ template <typename Tf, typename Tq> struct typed_particles_in_sphere {
   }
 };
 
+template <typename Tf, typename Tq, typename KernelType>
+void (*getSmoothingFunction(int propid))(SmoothingContext<Tf> *, npy_intp, int) {
+  switch (propid) {
+  case PROPID_RHO:
+    return &smDensity<Tf, KernelType>;
+  case PROPID_QTYMEAN_ND:
+    return &smMeanQtyND<Tf, Tq, KernelType>;
+  case PROPID_QTYDISP_ND:
+    return &smDispQtyND<Tf, Tq, KernelType>;
+  case PROPID_QTYMEAN_1D:
+    return &smMeanQty1D<Tf, Tq, KernelType>;
+  case PROPID_QTYDISP_1D:
+    return &smDispQty1D<Tf, Tq, KernelType>;
+  case PROPID_QTYDIV:
+    return &smDivQty<Tf, Tq, KernelType>;
+  case PROPID_QTYCURL:
+    return &smCurlQty<Tf, Tq, KernelType>;
+  default:
+    return NULL;
+  }
+}
+
 template <typename Tf, typename Tq> struct typed_populate {
   static PyObject *call(PyObject *self, PyObject *args) {
 
@@ -711,27 +734,17 @@ template <typename Tf, typename Tq> struct typed_populate {
 
     npy_intp total_particles = 0;
 
-    switch (propid) {
-    case PROPID_RHO:
-      pSmFn = &smDensity<Tf>;
-      break;
-    case PROPID_QTYMEAN_ND:
-      pSmFn = &smMeanQtyND<Tf, Tq>;
-      break;
-    case PROPID_QTYDISP_ND:
-      pSmFn = &smDispQtyND<Tf, Tq>;
-      break;
-    case PROPID_QTYMEAN_1D:
-      pSmFn = &smMeanQty1D<Tf, Tq>;
-      break;
-    case PROPID_QTYDISP_1D:
-      pSmFn = &smDispQty1D<Tf, Tq>;
+    // Use versions of the smoothing functions specialised to the kernel, so that evaluating it
+    // for each neighbour is a direct (inlineable) call. Kernel ids are as in kernels::Kernel::create.
+    switch (kernel_id) {
+    case 0:
+      pSmFn = getSmoothingFunction<Tf, Tq, kernels::CubicSplineKernel<Tf>>(propid);
       break;
-    case PROPID_QTYDIV:
-      pSmFn = &smDivQty<Tf, Tq>;
+    case 1:
+      pSmFn = getSmoothingFunction<Tf, Tq, kernels::WendlandC2Kernel<Tf>>(propid);
       break;
-    case PROPID_QTYCURL:
-      pSmFn = &smCurlQty<Tf, Tq>;
+    default:
+      pSmFn = getSmoothingFunction<Tf, Tq, kernels::Kernel<Tf>>(propid);
       break;
     }
 
@@ -32,6 +32,8 @@ public:
   std::vector<T> fList;
   std::vector<npy_intp> pList;
 
+  std::vector<T> fLeafDist2; // scratch space for smLeafDistancesSquared
+
   npy_intp pin = 0, pi = 0, pNext = 0; // particle indices for distributed loops (TODO: rationalise)
   npy_intp nCurrent = 0; // particle indices for distributed loops (TODO: rationalise)
 
@@ -47,6 +49,13 @@ public:
   std::unique_ptr<PriorityQueue<T>> priorityQueue;
   std::shared_ptr<kernels::Kernel<T>> pKernel;
 
+  // Positions in KDTree order, as separate x, y and z arrays each of length kd->nParticles, so that leaf scans read
+  // contiguous memory rather than gathering from pNumpyPos via particleOffsets. This is a second copy of all the
+  // positions, so it is only made when requested from smInit, is shared with thread-local copies of the context, and
+  // is freed along with the last context using it. If it has not been made, px/py/pz are null and pNumpyPos is read.
+  std::shared_ptr<const std::vector<T>> treeOrderedPos;
+  const T *px = nullptr, *py = nullptr, *pz = nullptr;
+
   SmoothingContext(KDContext* kd, npy_intp nSmooth, T fPeriod[3]) : kd(kd), nSmooth(nSmooth), fPeriod{fPeriod[0], fPeriod[1], fPeriod[2]},
       nListSize(nSmooth + RESMOOTH_SAFE), fList(nListSize), pList(nListSize),
       pMutex(std::make_shared<std::mutex>()),
@@ -59,7 +68,7 @@ public:
       nListSize(copy.nListSize), fList(nListSize), pList(nListSize), pMutex(copy.pMutex),
       smx_global(const_cast<SmoothingContext<T>*>(&copy)),
       priorityQueue(std::make_unique<PriorityQueue<T>>(nSmooth, kd->nActive)),
-      pKernel(copy.pKernel) { }
+      pKernel(copy.pKernel), treeOrderedPos(copy.treeOrderedPos), px(copy.px), py(copy.py), pz(copy.pz) { }
       // copy constructor takes a pointer to the global context
 
   void setupKernel(int kernel_id) {
@@ -102,7 +111,29 @@ void smCheckPeriodicityAndWarn(KDContext* kd, T fPeriod[3]) {
 }
 
 template<typename T>
-SmoothingContext<T> * smInit(KDContext* kd, int nSmooth, T fPeriod) {
+void smCopyTreeOrderedPositions(SmoothingContext<T> * smx) {
+  KDContext* kd = smx->kd;
+  npy_intp n = kd->nParticles;
+  auto pos = std::make_shared<std::vector<T>>(3 * n);
+  for (npy_intp i = 0; i < n; ++i) {
+    std::tie((*pos)[i], (*pos)[n + i], (*pos)[2 * n + i]) = GET2<T>(kd->pNumpyPos, kd->particleOffsets[i]);
+  }
+  smx->px = pos->data();
+  smx->py = smx->px + n;
+  smx->pz = smx->py + n;
+  smx->treeOrderedPos = std::move(pos);
+}
+
+template<typename T>
+inline std::tuple<T, T, T> smGetPosition(const SmoothingContext<T> * smx, npy_intp pj) {
+  // Position of the particle at KDTree order index pj
+  if (smx->px != nullptr)
+    return std::make_tuple(smx->px[pj], smx->py[pj], smx->pz[pj]);
+  return GET2<T>(smx->kd->pNumpyPos, smx->kd->particleOffsets[pj]);
+}
+
+template<typename T>
+SmoothingContext<T> * smInit(KDContext* kd, int nSmooth, T fPeriod, bool copyPositions) {
   T fPeriodArray[3] = {fPeriod, fPeriod, fPeriod};
 
   if(&(kd->kdNodes[ROOT]) == nullptr) {
@@ -119,6 +150,9 @@ SmoothingContext<T> * smInit(KDContext* kd, int nSmooth, T fPeriod) {
 
   auto smx = new SmoothingContext<T>(kd, nSmooth, fPeriodArray); // not shared_ptr because python will memory manage it
 
+  if (copyPositions)
+    smCopyTreeOrderedPositions(smx);
+
   return smx;
 
 }
@@ -164,24 +198,61 @@ npy_intp smGetNext(SmoothingContext<T> * smx_local) {
 
 
 
+template <typename T>
+inline const T* smLeafDistancesSquared(SmoothingContext<T> *smx, npy_intp start_particle, npy_intp end_particle,
+                                       T x, T y, T z) {
+  // Compute the squared distance from (x, y, z) to each particle in a leaf, returning a pointer to the results
+  // (valid until the next call). Working from the tree-ordered coordinate arrays, if available, in a loop with no
+  // branches or other side effects allows the compiler to vectorize this.
+  npy_intp n = end_particle - start_particle + 1;
+
+  if (static_cast<npy_intp>(smx->fLeafDist2.size()) < n)
+    smx->fLeafDist2.resize(n);
+
+  T *fDist2 = smx->fLeafDist2.data();
+
+  if (smx->px != nullptr) {
+    const T *px = smx->px + start_particle;
+    const T *py = smx->py + start_particle;
+    const T *pz = smx->pz + start_particle;
+
+    for (npy_intp i = 0; i < n; ++i) {
+      T dx = x - px[i];
+      T dy = y - py[i];
+      T dz = z - pz[i];
+      fDist2[i] = dx * dx + dy * dy + dz * dz;
+    }
+  } else {
+    T px, py, pz;
+    for (npy_intp i = 0; i < n; ++i) {
+      std::tie(px, py, pz) = smGetPosition(smx, start_particle + i);
+      T dx = x - px;
+      T dy = y - py;
+      T dz = z - pz;
+      fDist2[i] = dx * dx + dy * dy + dz * dz;
+    }
+  }
+
+  return fDist2;
+}
+
 template <typename T>
 void smBallSearch(SmoothingContext<T> *smx, T *ri) {
   // Search for the nearest neighbors to the particle at ri[3].
   // The priority queue must already be fully populated with some candidate particles. The better candidates the
   // faster the search will perform.
   KDNode *c;
-  npy_intp *p;
   KDContext* kd;
 
   PriorityQueue<T> *priorityQueue = smx->priorityQueue.get();
 
   npy_intp cell, cp, ct, pj;
 
-  T fDist2, dx, dy, dz, lx, ly, lz, sx, sy, sz, x, y, z;
+  T fDist2, lx, ly, lz, sx, sy, sz, x, y, z;
+  const T *fLeafDist2;
 
   kd = smx->kd;
   c = smx->kd->kdNodes;
-  p = smx->kd->particleOffsets;
 
   x = ri[0];
   y = ri[1];
@@ -197,14 +268,9 @@ void smBallSearch(SmoothingContext<T> *smx, T *ri) {
   npy_intp start_particle = c[cell].pLower;
   npy_intp end_particle = c[cell].pUpper;
 
+  fLeafDist2 = smLeafDistancesSquared<T>(smx, start_particle, end_particle, x, y, z);
   for (pj = start_particle; pj <= end_particle; ++pj) {
-    std::tie(dx, dy, dz) = GET2<T>(kd->pNumpyPos, p[pj]);
-    dx = x-dx;
-    dy = y-dy;
-    dz = z-dz;
-
-    fDist2 = dx * dx + dy * dy + dz * dz;
-    priorityQueue->push(fDist2, pj);
+    priorityQueue->push(fLeafDist2[pj - start_particle], pj);
   }
   while (cell != ROOT) {
     cp = SIBLING(cell);
@@ -222,10 +288,9 @@ void smBallSearch(SmoothingContext<T> *smx, T *ri) {
         start_particle = c[cp].pLower;
         end_particle = c[cp].pUpper;
 
+        fLeafDist2 = smLeafDistancesSquared<T>(smx, start_particle, end_particle, sx, sy, sz);
         for (pj = start_particle; pj <= end_particle; ++pj) {
-          std::tie(dx, dy, dz) = GET2<T>(kd->pNumpyPos, p[pj]);
-          dx = sx-dx; dy = sy-dy; dz = sz-dz;
-          fDist2 = dx * dx + dy * dy + dz * dz;
+          fDist2 = fLeafDist2[pj - start_particle];
           if (fDist2 < fBall2) {
             priorityQueue->push(fDist2, pj);
             fBall2 = priorityQueue->topDistanceSquaredOrMax();
@@ -273,13 +338,11 @@ npy_intp smBallGather(SmoothingContext<T> * smx, T fBall2, T *ri) {
   /* Gather all particles within the specified radius, using the storeResultFunction callback
    * to store the results. */
   KDNode *c;
-  npy_intp *p;
-  KDContext* kd = smx->kd;
   npy_intp pj, nCnt, cp, nSplit;
-  T dx, dy, dz, x, y, z, lx, ly, lz, sx, sy, sz, fDist2;
+  T x, y, z, lx, ly, lz, sx, sy, sz, fDist2;
+  const T *fLeafDist2;
 
   c = smx->kd->kdNodes;
-  p = smx->kd->particleOffsets;
   nSplit = smx->kd->nSplit;
   lx = smx->fPeriod[0];
   ly = smx->fPeriod[1];
@@ -302,11 +365,9 @@ npy_intp smBallGather(SmoothingContext<T> * smx, T fBall2, T *ri) {
       cp = LOWER(cp);
       continue;
     } else {
+      fLeafDist2 = smLeafDistancesSquared<T>(smx, c[cp].pLower, c[cp].pUpper, sx, sy, sz);
       for (pj = c[cp].pLower; pj <= c[cp].pUpper; ++pj) {
-        dx = sx - GET2<T>(kd->pNumpyPos, p[pj], 0);
-        dy = sy - GET2<T>(kd->pNumpyPos, p[pj], 1);
-        dz = sz - GET2<T>(kd->pNumpyPos, p[pj], 2);
-        fDist2 = dx * dx + dy * dy + dz * dz;
+        fDist2 = fLeafDist2[pj - c[cp].pLower];
         if (fDist2 <= fBall2) {
           nCnt = storeResultFunction(smx, fDist2, pj, nCnt);
         }
@@ -331,7 +392,6 @@ PyObject *getReturnParticleList(SmoothingContext<T> * smx);
 template <typename T>
 npy_intp smSmoothStep(SmoothingContext<T> * smx, int procid) {
   KDNode *c;
-  npy_intp *p;
 
   KDContext* kd = smx->kd;
   npy_intp pi, pin, pj, pNext, nCnt, nSmooth;
@@ -342,7 +402,6 @@ npy_intp smSmoothStep(SmoothingContext<T> * smx, int procid) {
   T ri[3];
 
   c = smx->kd->kdNodes;
-  p = smx->kd->particleOffsets;
 
   nSmooth = smx->nSmooth;
   pin = smx->pin;
@@ -395,9 +454,7 @@ npy_intp smSmoothStep(SmoothingContext<T> * smx, int procid) {
     // Mark - see comment above
     SETSMOOTH(T, pi, 10);
 
-    x = GET2<T>(kd->pNumpyPos, p[pi], 0);
-    y = GET2<T>(kd->pNumpyPos, p[pi], 1);
-    z = GET2<T>(kd->pNumpyPos, p[pi], 2);
+    std::tie(x, y, z) = smGetPosition(smx, pi);
 
     auto priorityQueue = smx->priorityQueue.get();
 
@@ -405,9 +462,10 @@ npy_intp smSmoothStep(SmoothingContext<T> * smx, int procid) {
       entry.ax -= ax;
       entry.ay -= ay;
       entry.az -= az;
-      dx = x + entry.ax - GET2<T>(kd->pNumpyPos, p[entry.getParticleIndex()], 0);
-      dy = y + entry.ay - GET2<T>(kd->pNumpyPos, p[entry.getParticleIndex()], 1);
-      dz = z + entry.az - GET2<T>(kd->pNumpyPos, p[entry.getParticleIndex()], 2);
+      std::tie(dx, dy, dz) = smGetPosition(smx, entry.getParticleIndex());
+      dx = x + entry.ax - dx;
+      dy = y + entry.ay - dy;
+      dz = z + entry.az - dz;
       entry.distanceSquared = dx * dx + dy * dy + dz * dz;
     });
 
@@ -421,9 +479,7 @@ npy_intp smSmoothStep(SmoothingContext<T> * smx, int procid) {
 
   // We are now in a situation where the priority queue has a reasonable starting list of candidates for the nearest
   // neighbours, and we can go ahead and perform a formal search
-  for (int j = 0; j < 3; ++j) {
-    ri[j] = GET2<T>(kd->pNumpyPos, p[pi], j);
-  }
+  std::tie(ri[0], ri[1], ri[2]) = smGetPosition(smx, pi);
 
   smBallSearch<T>(smx, ri);
   SETSMOOTH(T, pi, 0.5 * sqrt(smx->priorityQueue->topDistanceSquaredOrMax()));
@@ -623,13 +679,13 @@ void smDensitySym(SmoothingContext<T> * smx, npy_intp pi, int nSmooth) {
 
 
 
-template <typename T>
+template <typename T, typename KernelType = kernels::Kernel<T>>
 void smDensity(SmoothingContext<T> * smx, npy_intp pi, int nSmooth) {
   T fNorm, ih2, r2, rs, ih;
   npy_intp j, pj, pi_iord;
   KDContext* kd = smx->kd;
 
-  auto & kernel = *(smx->pKernel);
+  auto & kernel = static_cast<const KernelType &>(*(smx->pKernel));
 
   pi_iord = kd->particleOffsets[pi];
   ih = 1.0 / GET<T>(kd->pNumpySmooth, pi_iord);
@@ -648,13 +704,13 @@ void smDensity(SmoothingContext<T> * smx, npy_intp pi, int nSmooth) {
 
 
 
-template <typename Tf, typename Tq>
+template <typename Tf, typename Tq, typename KernelType = kernels::Kernel<Tf>>
 void smMeanQty1D(SmoothingContext<Tf> * smx, npy_intp pi, int nSmooth) {
   Tf fNorm, ih2, r2, rs, ih, mass, rho;
   npy_intp j, pj, pi_iord;
   KDContext* kd = smx->kd;
 
-  auto & kernel = *(smx->pKernel);
+  auto & kernel = static_cast<const KernelType &>(*(smx->pKernel));
 
   pi_iord = kd->particleOffsets[pi];
   ih = 1.0 / GET<Tf>(kd->pNumpySmooth, pi_iord);
@@ -675,13 +731,13 @@ void smMeanQty1D(SmoothingContext<Tf> * smx, npy_intp pi, int nSmooth) {
   }
 }
 
-template <typename Tf, typename Tq>
+template <typename Tf, typename Tq, typename KernelType = kernels::Kernel<Tf>>
 void smMeanQtyND(SmoothingContext<Tf> * smx, npy_intp pi, int nSmooth) {
   Tf fNorm, ih2, r2, rs, ih, mass, rho;
   npy_intp j, k, pj, pi_iord;
   KDContext* kd = smx->kd;
 
-  auto & kernel = *(smx->pKernel);
+  auto & kernel = static_cast<const KernelType &>(*(smx->pKernel));
 
   pi_iord = kd->particleOffsets[pi];
   ih = 1.0 / GET<Tf>(kd->pNumpySmooth, pi_iord);
@@ -707,14 +763,14 @@ void smMeanQtyND(SmoothingContext<Tf> * smx, npy_intp pi, int nSmooth) {
 }
 
 
-template <typename Tf, typename Tq>
+template <typename Tf, typename Tq, typename KernelType = kernels::Kernel<Tf>>
 void smCurlQty(SmoothingContext<Tf> * smx, npy_intp pi, int nSmooth) {
   Tf fNorm, ih2, r2, rs, q2, ih, mass, rho, dqty[3], qty_i[3];
   npy_intp j, k, pj, pi_iord, pj_iord;
   KDContext* kd = smx->kd;
   Tf curl[3], x, y, z, dx, dy, dz;
 
-  auto & kernel = *(smx->pKernel);
+  auto & kernel = static_cast<const KernelType &>(*(smx->pKernel));
 
   pi_iord = kd->particleOffsets[pi];
   ih = 1.0 / GET<Tf>(kd->pNumpySmooth, pi_iord);
@@ -762,14 +818,14 @@ void smCurlQty(SmoothingContext<Tf> * smx, npy_intp pi, int nSmooth) {
   }
 }
 
-template <typename Tf, typename Tq>
+template <typename Tf, typename Tq, typename KernelType = kernels::Kernel<Tf>>
 void smDivQty(SmoothingContext<Tf> * smx, npy_intp pi, int nSmooth) {
   Tf fNorm, ih2, r2, rs, q2, ih, mass, rho, div, dqty[3], qty_i[3];
   npy_intp j, k, pj, pi_iord, pj_iord;
   KDContext* kd = smx->kd;
   Tf x, y, z, dx, dy, dz;
 
-  auto & kernel = *(smx->pKernel);
+  auto & kernel = static_cast<const KernelType &>(*(smx->pKernel));
 
   pi_iord = kd->particleOffsets[pi];
   ih = 1.0 / GET<Tf>(kd->pNumpySmooth, pi_iord);
@@ -811,14 +867,14 @@ void smDivQty(SmoothingContext<Tf> * smx, npy_intp pi, int nSmooth) {
   }
 }
 
-template <typename Tf, typename Tq>
+template <typename Tf, typename Tq, typename KernelType = kernels::Kernel<Tf>>
 void smDispQtyND(SmoothingContext<Tf> * smx, npy_intp pi, int nSmooth) {
   Tf fNorm, ih2, r2, rs, ih, mass, rho;
   npy_intp j, k, pj, pi_iord;
   KDContext* kd = smx->kd;
   Tq mean[3], tdiff;
 
-  auto & kernel = *(smx->pKernel);
+  auto & kernel = static_cast<const KernelType &>(*(smx->pKernel));
 
   pi_iord = kd->particleOffsets[pi];
   ih = 1.0 / GET<Tf>(kd->pNumpySmooth, pi_iord);
@@ -867,14 +923,14 @@ void smDispQtyND(SmoothingContext<Tf> * smx, npy_intp pi, int nSmooth) {
           sqrt(GET<Tq>(kd->pNumpyQtySmoothed, pi_iord)));
 }
 
-template <typename Tf, typename Tq>
+template <typename Tf, typename Tq, typename KernelType = kernels::Kernel<Tf>>
 void smDispQty1D(SmoothingContext<Tf> * smx, npy_intp pi, int nSmooth) {
   Tf fNorm, ih2, r2, rs, ih, mass, rho;
   npy_intp j, pj, pi_iord;
   KDContext* kd = smx->kd;
   Tq mean, tdiff;
 
-  auto & kernel = *(smx->pKernel);
+  auto & kernel = static_cast<const KernelType &>(*(smx->pKernel));
 
   pi_iord = kd->particleOffsets[pi];
   ih = 1.0 / GET<Tf>(kd->pNumpySmooth, pi_iord);
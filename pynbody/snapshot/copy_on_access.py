@@ -6,22 +6,74 @@ to provide a transparent view of a snapshot that is actually stored in a differe
 
 import copy
 
+import numpy as np
+
+from .. import units
 from .simsnap import SimSnap
+from .subsnap import IndexedSubSnap
+
+# Property values of these types are immutable (units are deliberately never duplicated; see UnitBase.__deepcopy__)
+# so they can be shared between the original and copied properties
+_IMMUTABLE_PROPERTY_TYPES = (int, float, complex, str, bytes, type(None), np.generic, units.UnitBase)
+
+# Implementations of _get_family_slice that simply read from _family_slice; for snapshots using any other
+# implementation, the slices have to be recomputed family by family
+_STORED_FAMILY_SLICE_GETTERS = (SimSnap._get_family_slice, IndexedSubSnap._get_family_slice)
+
+def _fastcopy_property_value(v):
+    """Copy a single property value, avoiding the generic (and slow) deepcopy machinery for common value types"""
+    if isinstance(v, _IMMUTABLE_PROPERTY_TYPES):
+        return v
+    elif isinstance(v, np.ndarray):
+        return v.copy()
+    elif type(v) in (list, tuple):
+        return type(v)(_fastcopy_property_value(x) for x in v)
+    elif type(v) is dict:
+        return {k: _fastcopy_property_value(x) for k, x in v.items()}
+    else:
+        return copy.deepcopy(v)
+
+def _fastcopy_properties(properties):
+    """Copy a properties dictionary, using _fastcopy_property_value for each entry"""
+    copied = type(properties)()
+    for k, v in properties.items():
+        # bypass any SimDict setters, so that the stored entries are reproduced exactly
+        dict.__setitem__(copied, k, _fastcopy_property_value(v))
+    return copied
 
 
 class UnderlyingClassMixin:
     """Mixin for a SimSnap that allows it to derive quantities associated with another class."""
+
+    # Deriving functions found so far, keyed on (underlying class, snapshot class, array name). This assumes the
+    # classes are not modified after creation. Registering a derived array increments
+    # SimSnap._derived_array_registry_version, which empties the cache.
+    _deriving_function_cache = {}
+    _deriving_function_cache_version = None
+
     def __init__(self, underlying_class, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self._underlying_class = underlying_class
 
     def _find_deriving_function(self, name):
-        cl = self._underlying_class
-        if cl in self._derived_array_registry \
-                and name in self._derived_array_registry[cl]:
-            return self._derived_array_registry[cl][name]
-        else:
-            return super()._find_deriving_function(name)
+        cache = UnderlyingClassMixin._deriving_function_cache
+        if UnderlyingClassMixin._deriving_function_cache_version != SimSnap._derived_array_registry_version:
+            cache.clear()
+            UnderlyingClassMixin._deriving_function_cache_version = SimSnap._derived_array_registry_version
+
+        key = (self._underlying_class, type(self), name)
+        try:
+            return cache[key]
+        except KeyError:
+            fn = cache[key] = self._find_deriving_function_uncached(name)
+            return fn
+
+    def _find_deriving_function_uncached(self, name):
+        for cl in self._underlying_class.__mro__:
+            if cl in self._derived_array_registry \
+                    and name in self._derived_array_registry[cl]:
+                return self._derived_array_registry[cl][name]
+        return super()._find_deriving_function(name)
 
 class CopyOnAccessSimSnap(UnderlyingClassMixin, SimSnap):
     """SimSnap that copies data from another SimSnap when that data is needed.
@@ -29,6 +81,10 @@ class CopyOnAccessSimSnap(UnderlyingClassMixin, SimSnap):
     To the user, data which is already loaded in the underlying snapshot presents merely as 'loadable'
     (i.e. in loadable_keys)."""
 
+    # Names of arrays that the underlying snapshot should load, in a single prefetch request, as soon as a copy is
+    # created. Empty by default, so that creating a copy does no I/O.
+    prefetch_on_create = ()
+
     def __init__(self, base: SimSnap, underlying_class=None):
         self._copy_from = base
         if underlying_class is None:
@@ -43,10 +99,44 @@ class CopyOnAccessSimSnap(UnderlyingClassMixin, SimSnap):
         self._unifamily = base._unifamily
         self._file_units_system = base._file_units_system
         self._num_particles = len(base)
-        self._family_slice = {f: base._get_family_slice(f) for f in base.families()}
-        self._filename = base._filename+":copied_on_access"
-        self._dont_try_accessing = []
-        self.properties = copy.deepcopy(base.properties)
+        self._dont_try_accessing = set()
+        self._base_family_views = {}
+
+        # the family slices and properties are copied from the base snapshot when first needed
+        self._copied_family_slice = None
+        self._copied_properties = None
+
+        if self.prefetch_on_create:
+            self._prefetch_in_base(self.prefetch_on_create)
+
+    @property
+    def _filename(self):
+        return self._copy_from._filename + ":copied_on_access"
+
+    @property
+    def _family_slice(self):
+        if self._copied_family_slice is None:
+            base = self._copy_from
+            if type(base)._get_family_slice in _STORED_FAMILY_SLICE_GETTERS:
+                # slices are immutable, so a shallow copy of the base's own record is all that is needed
+                self._copied_family_slice = dict(base._family_slice)
+            else:
+                self._copied_family_slice = {f: base._get_family_slice(f) for f in base.families()}
+        return self._copied_family_slice
+
+    @_family_slice.setter
+    def _family_slice(self, value):
+        self._copied_family_slice = value
+
+    @property
+    def properties(self):
+        if self._copied_properties is None:
+            self._copied_properties = _fastcopy_properties(self._copy_from.properties)
+        return self._copied_properties
+
+    @properties.setter
+    def properties(self, value):
+        self._copied_properties = value
 
 
     def _load_array(self, array_name, fam=None):
@@ -55,16 +145,49 @@ class CopyOnAccessSimSnap(UnderlyingClassMixin, SimSnap):
         try:
             with self._copy_from.lazy_derive_off, self.lazy_derive_off, self.auto_propagate_off:
                 if fam is None:
-                    self[array_name] = self._copy_from[array_name]
+                    self._copy_in_array(array_name, self._copy_from[array_name])
                 else:
-                    self[fam][array_name] = self._copy_from[fam][array_name]
+                    self[fam][array_name] = self._get_base_family_view(fam)[array_name]
         except KeyError as e:
-            self._dont_try_accessing.append((array_name, fam))
+            self._dont_try_accessing.add((array_name, fam))
             raise OSError("Not found in underlying snapshot") from e
 
+    def _get_base_family_view(self, fam):
+        """Return the underlying snapshot's view of the given family, reusing it between loads"""
+        try:
+            return self._base_family_views[fam]
+        except KeyError:
+            view = self._base_family_views[fam] = self._copy_from[fam]
+            return view
+
+    def _copy_in_array(self, array_name, source):
+        """Equivalent to self[array_name] = source, but without zero-filling the new array before it is overwritten"""
+        if array_name not in self.keys() and not self._array_name_1D_to_ND(array_name):
+            self._assert_not_family_array(array_name)
+            ndim = source.shape[-1] if source.ndim > 1 else 1
+            self._create_array(array_name, ndim, dtype=source.dtype, zeros=False)
+        self[array_name] = source
+
+    def _names_to_load_in_base(self, array_names):
+        """Return those of the named arrays that the underlying snapshot would have to lazy-load"""
+        to_load = set(self._copy_from.loadable_keys()).difference(self._copy_from.keys())
+        return [name for name in array_names if name in to_load]
+
+    def _prefetch_in_base(self, array_names):
+        """Ask the underlying snapshot to load those of the named arrays it does not yet have, in one request"""
+        with self._copy_from.lazy_derive_off:
+            self._copy_from.prefetch(self._names_to_load_in_base(array_names))
+
+    def prefetch(self, array_names):
+        array_names = list(array_names)
+        # Pass everything the underlying snapshot would otherwise have to lazy-load one at a time down in a single
+        # request, so that it has the chance to retrieve them together; then copy in as normal
+        self._prefetch_in_base(array_names)
+        super().prefetch(array_names)
+
     def loadable_keys(self, fam=None):
         if fam is None:
             loaded_keys_in_parent = self._copy_from.keys()
         else:
             loaded_keys_in_parent = self._copy_from.family_keys(fam)
-        return list(set(self._copy_from.loadable_keys(fam)).union(loaded_keys_in_parent))
+        return list({*self._copy_from.loadable_keys(fam), *loaded_keys_in_parent})
@@ -19,7 +19,7 @@ import typing
 import warnings
 import weakref
 from functools import reduce
-from typing import Iterator
+from typing import Iterable, Iterator
 
 import numpy as np
 
@@ -65,6 +65,7 @@ class SimSnap(ContainerWithPhysicalUnitsOption, iter_subclasses.IterableSubclass
     # variables are defined, but I gave up on trying to debug it and put the docs there instead.
 
     _derived_array_registry = {}
+    _derived_array_registry_version = 0 # incremented whenever a derived array is registered, to invalidate caches
 
     _decorator_registry = {}
 
@@ -458,7 +459,7 @@ class SimSnap(ContainerWithPhysicalUnitsOption, iter_subclasses.IterableSubclass
         It serves two purposes; first it prevents overwriting of family names (so you can't
         write to, for instance, f.dm). Second, it implements persistent objects -- properties
         which are shared between two equivalent SubSnaps."""
-        if name in family.family_names():
+        if name in family._registry_names:
             raise AttributeError("Cannot assign family name " + name)
 
         if name in SimSnap._persistent:
@@ -843,6 +844,15 @@ class SimSnap(ContainerWithPhysicalUnitsOption, iter_subclasses.IterableSubclass
             raise NotImplementedError("Cannot load a copy of data that was itself partial-loaded")
         return load(self.ancestor.filename, take=self.get_index_list(self.ancestor))
 
+    def prefetch(self, array_names: Iterable[str]):
+        """Load or derive the named arrays now, rather than waiting for them to be accessed.
+
+        This has the same effect as accessing each array in turn, but subclasses may override it to retrieve
+        the arrays together more efficiently. A KeyError is raised if any of the arrays cannot be found.
+        """
+        for name in array_names:
+            self[name]
+
     ############################################
     # HELPER FUNCTIONS FOR LAZY LOADING
     ############################################
@@ -1461,6 +1471,7 @@ class SimSnap(ContainerWithPhysicalUnitsOption, iter_subclasses.IterableSubclass
         if cls not in SimSnap._derived_array_registry:
             SimSnap._derived_array_registry[cls] = {}
         SimSnap._derived_array_registry[cls][fn.__name__] = fn
+        SimSnap._derived_array_registry_version += 1
         fn.__stable__ = False
         cls._add_derived_to_doc(fn)
 
@@ -1502,6 +1513,7 @@ class SimSnap(ContainerWithPhysicalUnitsOption, iter_subclasses.IterableSubclass
         if cls not in SimSnap._derived_array_registry:
             SimSnap._derived_array_registry[cls] = {}
         SimSnap._derived_array_registry[cls][fn.__name__] = fn
+        SimSnap._derived_array_registry_version += 1
         fn.__stable__ = True
         cls._add_derived_to_doc(fn)
         return fn
@@ -1696,6 +1708,26 @@ class SimSnap(ContainerWithPhysicalUnitsOption, iter_subclasses.IterableSubclass
                                          serialized_tree,
                                          boxsize=self._get_boxsize_for_kdtree(),
                                          num_threads=num_threads)
+
+    def get_tree_ordered_copy(self) -> SimSnap:
+        """Return a copy-on-access view of this snapshot with the particles stored in kdtree order.
+
+        SPH operations loop over particles and their neighbours in the order they are stored in the kdtree, which
+        in the original snapshot means gathering from scattered memory locations. In the returned snapshot the
+        particles are permuted so that their index matches the kdtree order, and the tree is imported with an
+        identity index, so that these loops access memory sequentially.
+
+        The kdtree is built first if necessary. Element ``i`` of the copy corresponds to element
+        ``self.kdtree.particle_offsets[i]`` of this snapshot. Because the tree mixes particles of different
+        families, this is only possible for single-family snapshots (e.g. ``f.dm``).
+        """
+        self.build_tree()
+        leafsize, boxsize, kdnodes, particle_offsets, kernel_id = self.kdtree.serialize()
+        tree_ordered = self[particle_offsets].get_copy_on_access_simsnap()
+        tree_ordered.import_tree((leafsize, boxsize, kdnodes, np.arange(len(self), dtype=np.intp), kernel_id),
+                                 num_threads=self.kdtree.num_threads)
+        return tree_ordered
+
     def _get_boxsize_for_kdtree(self):
         boxsize = self.properties.get('boxsize', None)
         if boxsize:
@@ -34,7 +34,7 @@ namespace kernels
   };
 
   template <typename T>
-  class CubicSplineKernel : public Kernel<T>
+  class CubicSplineKernel final : public Kernel<T>
   {
   public:
     CubicSplineKernel() {}
@@ -68,7 +68,7 @@ namespace kernels
   };
 
   template <typename T>
-  class WendlandC2Kernel : public Kernel<T>
+  class WendlandC2Kernel final : public Kernel<T>
   {
   private:
     int nSmooth;
@@ -33,6 +33,21 @@ def test_copy_on_access_subsnap_data_isolation():
         assert (f['blob'] == np.arange(10)).all()
 
 
+def test_copy_on_access_3d_array():
+    f = pynbody.new(10)
+    f['pos'] = np.arange(30).reshape((10, 3))
+    f['pos'].units = "kpc"
+
+    f_sub = f[[2, 3, 4]].get_copy_on_access_simsnap()
+    assert (f_sub['pos'] == f['pos'][[2, 3, 4]]).all()
+    assert f_sub['pos'].units == "kpc"
+    assert (f_sub['y'] == [7, 10, 13]).all()
+
+    f_sub['pos'] += 1
+    assert (f_sub['y'] == [8, 11, 14]).all()
+    assert (f['pos'] == np.arange(30).reshape((10, 3))).all()
+
+
 class ExampleSnap(pynbody.snapshot.simsnap.SimSnap):
     pass
 
@@ -67,6 +82,36 @@ def test_copy_on_access_subsnap_emulating_class_two_layers_down():
 
 
 
+def test_copy_on_access_subsnap_emulating_subclass():
+    class ExampleSubclassSnap(ExampleSnap):
+        pass
+
+    f = pynbody.new(10, class_=ExampleSubclassSnap)
+    f['blob'] = np.arange(10)
+
+    f_sub = f[[2, 3, 4]].get_copy_on_access_simsnap()
+    assert (f_sub['foo'] == [7, 8, 9]).all()
+    assert 'foo' not in f.keys()
+
+
+def test_copy_on_access_derived_array_registered_later():
+    # register on a local class, so that ExampleSnap is left unchanged for other tests
+    class ExampleSubclassSnap(ExampleSnap):
+        pass
+
+    f = pynbody.new(10, class_=ExampleSubclassSnap)
+    f['blob'] = np.arange(10)
+
+    f_sub = f[[2, 3, 4]].get_copy_on_access_simsnap()
+    assert f_sub._find_deriving_function('bar') is None
+
+    @ExampleSubclassSnap.derived_array
+    def bar(sim):
+        return sim['blob']*2
+
+    assert (f_sub['bar'] == [4, 6, 8]).all()
+
+
 def test_copy_on_access_subsnap_family_array():
     f = pynbody.new(dm=10,star=10)
     f.dm['dm_only'] = np.arange(10)
@@ -122,6 +167,29 @@ def test_properties():
     assert f_c.properties['test_property'] == 100
     assert f.properties['test_property'] == 101
 
+def test_properties_copy_isolation():
+    f = pynbody.new(10)
+    f.properties['a'] = 0.5
+    f.properties['boxsize'] = pynbody.units.Unit("10 Mpc")
+    f.properties['array_property'] = np.arange(3)
+    f.properties['list_property'] = [1, 2]
+    f.properties['dict_property'] = {'nested': [np.arange(2)]}
+
+    f_c = f.get_copy_on_access_simsnap()
+    assert type(f_c.properties) is type(f.properties)
+    assert f_c.properties['z'] == 1.0
+    assert f_c.properties['boxsize'] is f.properties['boxsize']
+
+    f_c.properties['array_property'][0] = 100
+    f_c.properties['list_property'].append(3)
+    assert (f.properties['array_property'] == [0, 1, 2]).all()
+    assert f.properties['list_property'] == [1, 2]
+
+    f_c.properties['dict_property']['nested'][0][0] = 100
+    f_c.properties['dict_property']['other'] = 1
+    assert (f.properties['dict_property']['nested'][0] == [0, 1]).all()
+    assert 'other' not in f.properties['dict_property']
+
 def test_repr():
     f = pynbody.load("testdata/gasoline_ahf/g15784.lr.01024")
     f_c = f.get_copy_on_access_simsnap()
@@ -161,3 +229,50 @@ def test_only_try_loading_once():
 
     with pytest.raises(OSError, match="Previously tried"):
         f_c.dm._load_array('nonexistent')
+
+def test_prefetch():
+    f = pynbody.new(10, class_=ExampleSnap)
+    f['blob'] = np.arange(10)
+    f['pos'] = np.arange(30).reshape((10, 3))
+
+    f_sub = f[[2, 3, 4]].get_copy_on_access_simsnap()
+    f_sub.prefetch(['pos', 'blob', 'foo'])
+    assert {'pos', 'blob', 'foo'} <= set(f_sub.keys())
+    assert (f_sub['foo'] == [7, 8, 9]).all()
+    assert 'foo' not in f.keys()
+
+    with pytest.raises(KeyError):
+        f_sub.prefetch(['nonexistent'])
+
+class LoadableSnap(pynbody.snapshot.simsnap.SimSnap):
+    def loadable_keys(self, fam=None):
+        return ['loaded']
+
+    def _load_array(self, array_name, fam=None):
+        if array_name != 'loaded' or fam is not None:
+            raise OSError("Not loadable")
+        self['loaded'] = np.arange(len(self))
+
+
+def test_prefetch_on_create(monkeypatch):
+    f = pynbody.new(10, class_=LoadableSnap)
+    f[[2, 3, 4]].get_copy_on_access_simsnap()
+    assert 'loaded' not in f.keys()
+
+    monkeypatch.setattr(pynbody.snapshot.copy_on_access.CopyOnAccessSimSnap, 'prefetch_on_create', ('loaded', ))
+    f_sub = f[[2, 3, 4]].get_copy_on_access_simsnap()
+    assert 'loaded' in f.keys()
+    assert 'loaded' not in f_sub.keys()
+    assert (f_sub['loaded'] == [2, 3, 4]).all()
+
+
+class UnloadableSnap(LoadableSnap):
+    def _load_array(self, array_name, fam=None):
+        raise OSError("Simulated read failure")
+
+
+def test_prefetch_on_create_failure(monkeypatch):
+    monkeypatch.setattr(pynbody.snapshot.copy_on_access.CopyOnAccessSimSnap, 'prefetch_on_create', ('loaded', ))
+    f = pynbody.new(10, class_=UnloadableSnap)
+    with pytest.raises(KeyError):
+        f[[2, 3, 4]].get_copy_on_access_simsnap()
@@ -1,3 +1,4 @@
+import h5py
 import numpy as np
 import numpy.testing as npt
 import pytest
@@ -227,3 +228,66 @@ def test_default():
     assert isinstance(pynbody.analysis.ionfrac.get_current_ion_table(), pynbody.analysis.ionfrac.IonFractionTable)
     with pynbody.analysis.ionfrac.use_custom_ion_table('v1'):
         assert not isinstance(pynbody.analysis.ionfrac.get_current_ion_table(), pynbody.analysis.ionfrac.IonFractionTable)
+
+def test_cloudy_output_parsing():
+    def cloudy_line(element, log_fracs):
+        return " " + element.ljust(10) + "".join("%7.3f" % f for f in log_fracs)
+
+    result = pynbody.analysis.ionfrac._cloudy_output_line_to_dictionary(cloudy_line("Helium", [-2.0, -0.5, -10.25]))
+    assert set(result.keys()) == {'HeI', 'HeII', 'HeIII'}
+    npt.assert_allclose(sum(result.values()), 1.0)
+    npt.assert_allclose(result['HeI'] / result['HeII'], 10 ** -1.5, rtol=1e-6)
+
+    result = pynbody.analysis.ionfrac._cloudy_output_line_to_dictionary(cloudy_line("Hydrogen", [-4.0, 0.0, -12.0]))
+    assert set(result.keys()) == {'HI', 'HII', 'H2'}
+
+    assert pynbody.analysis.ionfrac._cloudy_output_line_to_dictionary(cloudy_line("Electron", [-1.0, -1.0])) == {}
+
+def _synthetic_table_and_snap():
+    redshift_values = np.array([0.0, 1.0, 2.0])
+    log_temp_values = np.linspace(2.0, 8.0, 4)
+    log_den_values = np.linspace(-8.0, 2.0, 5)
+    np.random.seed(1)
+    tables = {'OVI': np.random.uniform(size=(3, 4, 5)), 'HI': np.random.uniform(size=(3, 4, 5))}
+    tables['HI'][0, 0, 0] = 0.0
+    table = pynbody.analysis.ionfrac.IonFractionTable(redshift_values, log_temp_values, log_den_values, tables)
+
+    f = pynbody.new(gas=100)
+    f.properties['a'] = 0.6
+    f.gas['rho'] = pynbody.array.SimArray(10 ** np.random.uniform(-9, 3, 100), 'm_p cm^-3')
+    f.gas['temp'] = pynbody.array.SimArray(10 ** np.random.uniform(1, 9, 100), 'K')
+
+    return table, f
+
+@pytest.mark.parametrize('extension', ('hdf5', 'npz'))
+def test_save_and_load(tmp_path, extension):
+    table, f = _synthetic_table_and_snap()
+    filename = tmp_path / ("table." + extension)
+    table.save(filename)
+    assert h5py.is_hdf5(filename) == (extension == 'hdf5')
+
+    loaded = pynbody.analysis.ionfrac.IonFractionTable.load(filename)
+    # the file must not be held open, so that a loaded table can be saved back over its source
+    loaded.save(filename)
+    loaded = pynbody.analysis.ionfrac.IonFractionTable.load(filename)
+
+    for ion in ('ovi', 'HI'):
+        npt.assert_allclose(loaded.calculate(f, ion), table.calculate(f, ion))
+
+def test_save_without_extension(tmp_path):
+    table, f = _synthetic_table_and_snap()
+    table.save(tmp_path / "table")
+    assert not h5py.is_hdf5(tmp_path / "table.npz")
+
+    loaded = pynbody.analysis.ionfrac.IonFractionTable.load(tmp_path / "table.npz")
+    npt.assert_allclose(loaded.calculate(f, 'ovi'), table.calculate(f, 'ovi'))
+
+def test_prepare():
+    table, f = _synthetic_table_and_snap()
+    prepared = table.prepare(f)
+
+    for ion in ('ovi', 'HI'):
+        npt.assert_allclose(table.calculate(prepared, ion), table.calculate(f, ion))
+
+    # the inputs must not be modified by calculating
+    npt.assert_allclose(table.calculate(prepared, 'ovi'), table.calculate(f, 'ovi'))
@@ -81,6 +81,11 @@ def test_smooth(v_mean, v_disp, rho, smooth, snap):
     vz_mean = snap.dm.kdtree.sph_mean(snap.dm['vz'], 32)
     npt.assert_allclose(v_mean[:,2],vz_mean[::100],rtol=1e-8)
 
+    # check 3D dispersion in a single pass
+    v_disp_3d = snap.dm.kdtree.sph_dispersion(snap.dm['vel'], 32)
+    assert v_disp_3d.shape == (len(snap.dm),)
+    npt.assert_allclose(v_disp, v_disp_3d[::100], rtol=1e-8)
+
     # check 1D dispersions
     v_disp_squared = (
             snap.dm.kdtree.sph_dispersion(snap.dm['vx'], 32) ** 2 +
@@ -294,6 +299,17 @@ def test_kdtree_from_existing_kdtree(npart=1000):
     npt.assert_allclose(f['smooth'], f_copy['smooth'], atol=1e-7)
 
 
+def test_tree_ordered_copy(npart=1000):
+    f = _make_test_gaussian(npart)
+    f_ordered = f.get_tree_ordered_copy()
+    order = f.kdtree.particle_offsets
+
+    npt.assert_equal(f_ordered['pos'], f['pos'][order])
+    npt.assert_equal(f_ordered.kdtree.particle_offsets, np.arange(npart))
+    npt.assert_allclose(f_ordered['smooth'], f['smooth'][order], rtol=1e-6)
+    npt.assert_allclose(f_ordered['rho'], f['rho'][order], rtol=1e-6)
+
+
 def _make_test_gaussian(npart):
     f = pynbody.new(dm=npart)
     np.random.seed(1337)
@@ -13,37 +13,37 @@ def get_data():
     pynbody.test_utils.ensure_test_data_available("gadget", "arepo", "hbt", "tng_subfind")
 
 
-@pytest.fixture
+@pytest.fixture(scope='module')
 def snap():
     with pytest.warns(UserWarning, match="Masses are either stored in the header or have another dataset .*"):
         return pynbody.load('testdata/gadget4_subfind/snapshot_000.hdf5')
 
-@pytest.fixture
+@pytest.fixture(scope='module')
 def halos(snap):
     return pynbody.halo.subfindhdf.Gadget4SubfindHDFCatalogue(snap)
 
-@pytest.fixture
+@pytest.fixture(scope='module')
 def subhalos(snap):
     return pynbody.halo.subfindhdf.Gadget4SubfindHDFCatalogue(snap, subhalos=True)
 
-@pytest.fixture
+@pytest.fixture(scope='module')
 def htest():
     return Halos('testdata/gadget4_subfind/', 0)
 
-@pytest.fixture
+@pytest.fixture(scope='module')
 def snap_arepo():
     with pytest.warns(UserWarning, match="Masses are either stored in the header or have another dataset .*"):
         return pynbody.load('testdata/arepo/cosmobox_015.hdf5')
 
-@pytest.fixture
+@pytest.fixture(scope='module')
 def halos_arepo(snap_arepo):
     return pynbody.halo.subfindhdf.ArepoSubfindHDFCatalogue(snap_arepo)
 
-@pytest.fixture
+@pytest.fixture(scope='module')
 def subhalos_arepo(snap_arepo):
     return pynbody.halo.subfindhdf.ArepoSubfindHDFCatalogue(snap_arepo, subhalos=True)
 
-@pytest.fixture
+@pytest.fixture(scope='module')
 def htest_arepo():
     return Halos('testdata/arepo/', 15)
 
@@ -83,29 +83,32 @@ def test_halo_or_subhalo_properties(mode, subhalo_mode, halos, snap, htest, halo
 
     halos_str = 'subhalos' if subhalo_mode else 'halos'
     if mode == 'gadget4':
-        comparison_catalogue, pynbody_catalogue = htest.load()[halos_str], snap.halos(subhalos=subhalos)
+        comparison_catalogue, pynbody_catalogue = htest.properties[halos_str], snap.halos(subhalos=subhalos)
     elif mode=='arepo':
-        comparison_catalogue, pynbody_catalogue = htest_arepo.load()[halos_str], snap_arepo.halos(subhalos=subhalos)
+        comparison_catalogue, pynbody_catalogue = htest_arepo.properties[halos_str], snap_arepo.halos(subhalos=subhalos)
     else:
         raise ValueError("Invalid mode")
 
     np.random.seed(1)
     hids = np.random.choice(range(len(pynbody_catalogue)), 20)
 
-    for hid in hids:
-        for key in list(comparison_catalogue.keys()):
-            props = pynbody_catalogue.get_dummy_halo(hid).properties
-            if key in list(props.keys()):
-                value = props[key]
-                if pynbody.units.is_unit(value):
-                    orig_units = pynbody_catalogue.base.infer_original_units(value)
-                    value = value.in_units(orig_units)
-                np.testing.assert_allclose(value, comparison_catalogue[key][hid])
+    all_props = [pynbody_catalogue.get_dummy_halo(hid).properties for hid in hids]
+    for key in list(comparison_catalogue.keys()):
+        key_hids = [hid for hid, props in zip(hids, all_props) if key in props]
+        if len(key_hids) == 0:
+            continue
+        values = [props[key] for props in all_props if key in props]
+        if pynbody.units.is_unit(values[0]):
+            # all halos share the same dimensions for a given key, so only need to infer the units once
+            orig_units = pynbody_catalogue.base.infer_original_units(values[0])
+            values = [value.in_units(orig_units) for value in values]
+        np.testing.assert_allclose(np.array(values), comparison_catalogue[key][np.array(key_hids)])
 
     pynbody_all = pynbody_catalogue.get_properties_all_halos()
     for key in list(comparison_catalogue.keys()):
         if key in pynbody_all.keys():
-            np.testing.assert_allclose(pynbody_all[key], comparison_catalogue[key])
+            assert np.shape(pynbody_all[key]) == np.shape(comparison_catalogue[key]), "Shape mismatch for " + key
+            np.testing.assert_allclose(pynbody_all[key], comparison_catalogue[key], err_msg="Mismatch for " + key)
 
 @pytest.mark.filterwarnings("ignore:Unable to infer units from HDF attributes")
 def test_halo_loading(halos, htest, halos_arepo, htest_arepo) :
@@ -119,8 +122,8 @@ def test_halo_loading(halos, htest, halos_arepo, htest_arepo) :
     _ = halos_arepo[1]['pos']
     _ = halos_arepo[0]['mass'].sum()
     _ = halos_arepo[1]['mass'].sum()
-    assert(len(halos[0]['iord']) == len(halos[0]) == htest.load()['halos']['GroupLenType'][0, 1])
-    arepo_halos = htest_arepo.load()['halos']
+    assert(len(halos[0]['iord']) == len(halos[0]) == htest.properties['halos']['GroupLenType'][0, 1])
+    arepo_halos = htest_arepo.properties['halos']
     assert(len(halos_arepo[0]['iord']) == len(halos_arepo[0]) == np.sum(arepo_halos['GroupLenType'][0, :], axis=-1))
 
 def test_subhalos(halos):